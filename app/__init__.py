@@ -1,10 +1,40 @@
+import logging
+import time
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from config import get_config
 
 # Initialize database
 db = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged at WARNING with their SQL
+SLOW_QUERY_SECONDS = 0.1
+
+def note_query_start(conn, cursor, statement, parameters, context, executemany):
+    # Stack of start times so nested cursor executes pair up correctly
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if elapsed > SLOW_QUERY_SECONDS:
+        logger.warning("slow query (%.0f ms): %s", elapsed * 1000, statement)
+
+def set_sqlite_pragmas(dbapi_conn, _):
+    # WAL lets readers proceed while a write commits, and NORMAL sync cuts
+    # the per-commit fsync cost; temp_store and cache_size keep sorts and
+    # hot pages in memory (cache_size is negative KB, so -64000 is 64MB)
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
 def create_app():
     # Initialize Flask app
     app = Flask(__name__)
@@ -14,12 +44,25 @@ def create_app():
     
     # Initialize database with app
     db.init_app(app)
-    
+
+    # Apply the SQLite pragmas on every new pooled connection; other
+    # backends configure the equivalent through SQLALCHEMY_ENGINE_OPTIONS
+    with app.app_context():
+        engine = db.engine
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+
+    # Surface slow statements instead of hand-timing individual views;
+    # two perf_counter calls per query when everything is fast
+    event.listen(engine, 'before_cursor_execute', note_query_start)
+    event.listen(engine, 'after_cursor_execute', log_slow_query)
+
     # Import models and routes after initializing db
-    from app import models, routes
-    
+    from app import models, routes, auth
+
     # Register blueprints
     app.register_blueprint(routes.bp)
+    app.register_blueprint(auth.bp)
     
     return app
 # Generated by Copilot
\ No newline at end of file
@@ -0,0 +1,123 @@
+# Authentication routes for the health tracker application
+
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from argon2.exceptions import VerifyMismatchError
+from cachetools import TTLCache
+from .models import db, User, password_hasher
+from .forms import LoginForm
+
+# Create a Blueprint for the authentication routes
+bp = Blueprint('auth', __name__, url_prefix='/auth')
+
+# Bounded pool for the deliberately slow Argon2 verification; under async
+# workers the request greenlet yields while the hash runs here, and the
+# worker count caps how many concurrent hashes can burn CPU at once
+hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# Hash computed once at import and verified for unknown usernames, so the
+# response time of login() does not reveal whether an account exists
+DUMMY_HASH = password_hasher.hash('dummy-password')
+
+# Short-lived cache of (user id, password hash) keyed by username, so
+# repeated login attempts (e.g. credential stuffing) don't hammer the DB.
+# Unknown usernames are cached as None too - stuffing runs mostly probe
+# names that don't exist, and the TTL bounds how long a freshly
+# registered name can be seen as missing
+user_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# Distinguishes "not cached" from a cached negative lookup
+_CACHE_MISS = object()
+
+def lookup_credentials(username):
+    # Return (user_id, password_hash) for the username, or None if it is
+    # unknown, via the TTL cache; only the two columns are fetched, not
+    # the full ORM row
+    cached = user_cache.get(username, _CACHE_MISS)
+    if cached is _CACHE_MISS:
+        row = (User.query.with_entities(User.id, User.password_hash)
+               .filter_by(username=username).first())
+        cached = (row.id, row.password_hash) if row is not None else None
+        user_cache[username] = cached
+    return cached
+
+def verify_hash(stored_hash, password):
+    # Verify a password against a stored Argon2 hash
+    try:
+        password_hasher.verify(stored_hash, password)
+        return True
+    except VerifyMismatchError:
+        return False
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '')
+
+        if not username or not password:
+            flash('Username and password are required')
+            return redirect(url_for('auth.register'))
+
+        if User.query.filter_by(username=username).first():
+            flash('Username is already taken')
+            return redirect(url_for('auth.register'))
+
+        user = User(username=username)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        # Drop a cached negative lookup so the new account can log in
+        # right away
+        user_cache.pop(username, None)
+        flash('Account created successfully, please log in')
+        return redirect(url_for('auth.login'))
+
+    return render_template('signup.html')
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    # WTForms rejects malformed POSTs (missing fields, oversized values,
+    # bad CSRF token) before any Argon2 work happens
+    form = LoginForm()
+    if form.validate_on_submit():
+        username = form.username.data.strip()
+        password = form.password.data
+
+        credentials = lookup_credentials(username)
+        # Always run a hash verification of equal cost so invalid usernames
+        # take as long to reject as invalid passwords
+        if credentials:
+            user_id, stored_hash = credentials
+        else:
+            user_id, stored_hash = None, DUMMY_HASH
+        try:
+            password_ok = hash_pool.submit(verify_hash, stored_hash, password).result(timeout=2.0)
+        except FutureTimeoutError:
+            password_ok = False
+        if user_id is not None and password_ok:
+            if password_hasher.check_needs_rehash(stored_hash):
+                # Upgrade the stored hash and drop the stale cache entry
+                user = db.session.get(User, user_id)
+                user.set_password(password)
+                db.session.commit()
+                user_cache.pop(username, None)
+            session['user_id'] = user_id
+            flash('Logged in successfully')
+            return redirect(url_for('main.index'))
+
+        flash('Invalid username or password')
+        return redirect(url_for('auth.login'))
+
+    if form.errors:
+        flash('Invalid login request')
+        return redirect(url_for('auth.login'))
+
+    return render_template('login.html', form=form)
+
+@bp.route('/logout')
+def logout():
+    session.pop('user_id', None)
+    flash('Logged out')
+    return redirect(url_for('main.index'))
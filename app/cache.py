@@ -0,0 +1,15 @@
+# Request-scoped caching helpers for the health tracker application
+
+from flask import g
+from .models import Person
+
+def cached_persons():
+    # Memoize Person.query.all() on flask.g so pages that need the person
+    # list more than once per request only hit the database once
+    if not hasattr(g, '_persons'):
+        g._persons = Person.query.all()
+    return g._persons
+
+def invalidate_persons():
+    # Drop the memoized list after a mutation within the same request
+    g.pop('_persons', None)
@@ -0,0 +1,31 @@
+# WTForms form definitions for the health tracker application
+
+from flask_wtf import FlaskForm
+from wtforms import StringField, PasswordField, IntegerField
+from wtforms.fields import DateTimeLocalField
+from wtforms.validators import DataRequired, Length, NumberRange, Optional, ValidationError
+
+class LoginForm(FlaskForm):
+    # Length limits reject oversized payloads before any hashing happens
+    username = StringField('Username', validators=[DataRequired(), Length(max=80)])
+    password = PasswordField('Password', validators=[DataRequired(), Length(max=128)])
+
+class HealthDataForm(FlaskForm):
+    # Range messages match the old hand-rolled validators so the flashed
+    # text stays the same
+    person_id = IntegerField('Person', validators=[DataRequired()])
+    systolic = IntegerField('Systolic', validators=[
+        DataRequired(), NumberRange(100, 200, 'Systolic pressure must be between 100-200')])
+    diastolic = IntegerField('Diastolic', validators=[
+        DataRequired(), NumberRange(60, 160, 'Diastolic pressure must be between 60-160')])
+    heart_rate = IntegerField('Heart Rate', validators=[
+        DataRequired(), NumberRange(50, 200, 'Heart rate must be between 50-200')])
+    tags = StringField('Tags', validators=[Optional(), Length(max=100)])
+    timestamp = DateTimeLocalField('Date and Time', format='%Y-%m-%dT%H:%M',
+                                   validators=[Optional()])
+
+    def validate_diastolic(self, field):
+        # Cross-field check that the hand-rolled validators used to run
+        if (self.systolic.data is not None and field.data is not None
+                and self.systolic.data <= field.data):
+            raise ValidationError('Systolic pressure must be greater than diastolic pressure')
@@ -1,6 +1,36 @@
 from datetime import datetime
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
 from app import db
 
+# Argon2id hasher tuned so a hash takes roughly 250ms on current hardware
+password_hasher = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=1)
+
+class User(db.Model):
+    __tablename__ = 'user'
+
+    id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each user
+    username = db.Column(db.String(80), unique=True, nullable=False)  # Login name
+    password_hash = db.Column(db.String(255), nullable=False)  # Argon2id password hash
+
+    def set_password(self, password):
+        # Store an Argon2id hash of the password
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        # Verify the password and transparently upgrade the stored hash if
+        # the hasher parameters have changed since it was created
+        try:
+            password_hasher.verify(self.password_hash, password)
+        except VerifyMismatchError:
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
+
+    def __repr__(self):
+        return f'<User {self.id}: Username={self.username}>'
+
 class Person(db.Model):
     __tablename__ = 'person'
     
@@ -15,7 +45,21 @@ class Person(db.Model):
 
 class HealthData(db.Model):
     __tablename__ = 'health_data'
-    
+
+    # Indexes so ORDER BY timestamp (index/chart) streams in index order
+    # instead of sorting the whole table per request; CHECK constraints
+    # enforce the measurement ranges server-side, so they also hold for
+    # rows arriving through the Core bulk-insert import path
+    __table_args__ = (
+        db.Index('ix_health_data_timestamp', 'timestamp'),
+        db.Index('ix_health_data_person_ts', 'person_id', 'timestamp'),
+        db.CheckConstraint('systolic BETWEEN 100 AND 200', name='ck_health_data_systolic'),
+        db.CheckConstraint('diastolic BETWEEN 60 AND 160', name='ck_health_data_diastolic'),
+        db.CheckConstraint('heart_rate BETWEEN 50 AND 200', name='ck_health_data_heart_rate'),
+        db.CheckConstraint('systolic > diastolic', name='ck_health_data_sys_gt_dia'),
+    )
+
+
     id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each entry
     person_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)  # Foreign key reference to the person
     systolic = db.Column(db.Integer, nullable=False)  # Systolic blood pressure (high value)
@@ -26,10 +70,5 @@ class HealthData(db.Model):
     
     person = db.relationship('Person', backref=db.backref('health_data', lazy=True))
 
-    @property
-    def blood_pressure(self):
-        # Provide backward compatibility for templates still using blood_pressure
-        return f"{self.systolic}/{self.diastolic}"
-    
     def __repr__(self):
         return f'<HealthData {self.id}: PersonID={self.person_id}, BP={self.systolic}/{self.diastolic}, HR={self.heart_rate}, Time={self.timestamp}>'
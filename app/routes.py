@@ -1,200 +1,295 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+import hashlib
+import io
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, jsonify
+from sqlalchemy.orm import joinedload
 from .models import db, HealthData, Person
+from .data_import import DataImporter
+from .cache import cached_persons, invalidate_persons
+from .forms import HealthDataForm
 from datetime import datetime
 
+# Extensions we accept for uploaded import files
+ALLOWED_EXTENSIONS = {'.csv', '.xlsx', '.xls', '.txt'}
+
+# Background pool and in-process job registry for file imports, so the
+# request worker is not blocked on parsing and inserting large files
+import_pool = ThreadPoolExecutor(max_workers=2)
+IMPORT_JOBS = {}
+
+# (content digest, person) of uploads already submitted, so re-uploading
+# the same file - a common habit while debugging an export - short-circuits
+# to the prior job instead of re-running the whole import. Failed or
+# fruitless jobs are not deduplicated, so those uploads can be retried
+IMPORT_DIGESTS = {}
+
+# Cap on remembered jobs, so the registries stay bounded in a long-lived
+# process; the oldest finished entries are evicted first
+MAX_IMPORT_JOBS = 100
+
+def prune_import_jobs():
+    # Evict the oldest finished jobs (and their digest mappings) once the
+    # registry exceeds the cap; running jobs are never evicted
+    excess = len(IMPORT_JOBS) - MAX_IMPORT_JOBS
+    if excess <= 0:
+        return
+    for job_id, job in list(IMPORT_JOBS.items()):
+        if excess <= 0:
+            break
+        if job['status'] != 'running':
+            del IMPORT_JOBS[job_id]
+            excess -= 1
+    for digest, job_id in list(IMPORT_DIGESTS.items()):
+        if job_id not in IMPORT_JOBS:
+            del IMPORT_DIGESTS[digest]
+
+def run_import(app, job_id, source, extension, person_id):
+    # Run one import inside an application context on the pool thread
+    with app.app_context():
+        try:
+            if extension == '.csv':
+                results = DataImporter.import_from_csv(source, person_id)
+            elif extension in ('.xlsx', '.xls'):
+                results = DataImporter.import_from_excel(source, person_id)
+            else:
+                results = DataImporter.import_from_text(source, person_id)
+            IMPORT_JOBS[job_id] = {'status': 'done', 'results': results}
+        except Exception as e:
+            IMPORT_JOBS[job_id] = {'status': 'failed', 'error': str(e)}
+
 # Create a Blueprint for the routes
 bp = Blueprint('main', __name__)
 
+# Number of entries shown per page on the index
+ENTRIES_PER_PAGE = 50
+
 @bp.route('/')
 def index():
-    # Fetch all health data entries from the database, ordered by timestamp
-    entries = HealthData.query.order_by(HealthData.timestamp.desc()).all()
-    persons = Person.query.all()
-    return render_template('index.html', entries=entries, persons=persons)
-
-def validate_systolic(systolic_str):
-    try:
-        systolic = int(systolic_str)
-        if not (100 <= systolic <= 200):
-            return False, "Systolic pressure must be between 100-200"
-        return True, systolic
-    except:
-        return False, "Systolic pressure must be a number"
-
-def validate_diastolic(diastolic_str):
-    try:
-        diastolic = int(diastolic_str)
-        if not (60 <= diastolic <= 160):
-            return False, "Diastolic pressure must be between 60-160"
-        return True, diastolic
-    except:
-        return False, "Diastolic pressure must be a number"
-
-def validate_heart_rate(hr_str):
-    try:
-        hr = int(hr_str)
-        if not (50 <= hr <= 200):
-            return False, "Heart rate must be between 50-200"
-        return True, hr
-    except:
-        return False, "Heart rate must be a number"
+    # Fetch one page of health data entries instead of the whole table;
+    # paginate() also hands the template prev/next metadata.
+    # joinedload pulls each entry's person in the same query; the template
+    # reads entry.person.name per row, which would otherwise lazy-load one
+    # SELECT per entry (N+1)
+    pagination = (HealthData.query.options(joinedload(HealthData.person))
+                  .order_by(HealthData.timestamp.desc())
+                  .paginate(per_page=ENTRIES_PER_PAGE, error_out=False))
+    persons = cached_persons()
+    return render_template('index.html', entries=pagination.items,
+                           pagination=pagination, persons=persons,
+                           form=HealthDataForm())
+
+def health_form_data(form):
+    # Map a validated HealthDataForm onto HealthData column values
+    return {
+        'person_id': form.person_id.data,
+        'systolic': form.systolic.data,
+        'diastolic': form.diastolic.data,
+        'heart_rate': form.heart_rate.data,
+        'tags': form.tags.data or None,
+        'timestamp': form.timestamp.data or datetime.utcnow(),
+    }
 
 @bp.route('/add', methods=['POST'])
 def add_health_data():
-    person_id = request.form.get('person_id')
-    systolic = request.form.get('systolic')
-    diastolic = request.form.get('diastolic')
-    heart_rate = request.form.get('heart_rate')
-    tags = request.form.get('tags')
-    timestamp_str = request.form.get('timestamp')
-
-    # Validate systolic pressure
-    sys_valid, sys_result = validate_systolic(systolic)
-    if not sys_valid:
-        flash(sys_result)
-        return redirect(url_for('main.index'))
-    systolic_value = sys_result
-
-    # Validate diastolic pressure
-    dias_valid, dias_result = validate_diastolic(diastolic)
-    if not dias_valid:
-        flash(dias_result)
-        return redirect(url_for('main.index'))
-    diastolic_value = dias_result
-
-    # Ensure systolic is greater than diastolic
-    if systolic_value <= diastolic_value:
-        flash("Systolic pressure must be greater than diastolic pressure")
+    # WTForms runs the range checks and the systolic/diastolic cross-check
+    # through its precompiled validator chain, and adds CSRF protection
+    form = HealthDataForm()
+    if not form.validate_on_submit():
+        flash(next(iter(form.errors.values()))[0])
         return redirect(url_for('main.index'))
 
-    # Validate heart rate
-    hr_valid, hr_result = validate_heart_rate(heart_rate)
-    if not hr_valid:
-        flash(hr_result)
-        return redirect(url_for('main.index'))
-    heart_rate_value = hr_result
-
-    # Process timestamp
-    if timestamp_str:
-        try:
-            timestamp = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M')
-        except ValueError:
-            flash("Invalid date format")
-            return redirect(url_for('main.index'))
-    else:
-        timestamp = datetime.utcnow()
-
     # Create a new health data entry
-    new_entry = HealthData(
-        person_id=person_id,
-        systolic=systolic_value,
-        diastolic=diastolic_value,
-        heart_rate=heart_rate_value,
-        tags=tags,
-        timestamp=timestamp
-    )
-    db.session.add(new_entry)
+    db.session.add(HealthData(**health_form_data(form)))
     db.session.commit()
+    invalidate_chart_cache()
 
     return redirect(url_for('main.index'))
 
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit_health_data(id):
-    entry = HealthData.query.get_or_404(id)
+    # db.session.get hits the identity map and the compiled-query cache,
+    # avoiding the legacy Query.get_or_404 path
+    entry = db.session.get(HealthData, id) or abort(404)
+    form = HealthDataForm()
     if request.method == 'POST':
-        person_id = request.form.get('person_id')
-        systolic = request.form.get('systolic')
-        diastolic = request.form.get('diastolic')
-        heart_rate = request.form.get('heart_rate')
-        tags = request.form.get('tags')
-        timestamp_str = request.form.get('timestamp')
-
-        # Validate systolic pressure
-        sys_valid, sys_result = validate_systolic(systolic)
-        if not sys_valid:
-            flash(sys_result)
-            return redirect(url_for('main.edit_health_data', id=id))
-        systolic_value = sys_result
-
-        # Validate diastolic pressure
-        dias_valid, dias_result = validate_diastolic(diastolic)
-        if not dias_valid:
-            flash(dias_result)
-            return redirect(url_for('main.edit_health_data', id=id))
-        diastolic_value = dias_result
-
-        # Ensure systolic is greater than diastolic
-        if systolic_value <= diastolic_value:
-            flash("Systolic pressure must be greater than diastolic pressure")
-            return redirect(url_for('main.edit_health_data', id=id))
-
-        # Validate heart rate
-        hr_valid, hr_result = validate_heart_rate(heart_rate)
-        if not hr_valid:
-            flash(hr_result)
+        if not form.validate_on_submit():
+            flash(next(iter(form.errors.values()))[0])
             return redirect(url_for('main.edit_health_data', id=id))
-        heart_rate_value = hr_result
-
-        # Process timestamp
-        if timestamp_str:
-            try:
-                timestamp = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M')
-            except ValueError:
-                flash("Invalid date format")
-                return redirect(url_for('main.edit_health_data', id=id))
-        else:
-            timestamp = datetime.utcnow()
 
         # Update the health data entry
-        entry.person_id = person_id
-        entry.systolic = systolic_value
-        entry.diastolic = diastolic_value
-        entry.heart_rate = heart_rate_value
-        entry.tags = tags
-        entry.timestamp = timestamp
+        for field, value in health_form_data(form).items():
+            setattr(entry, field, value)
 
         db.session.commit()
+        invalidate_chart_cache()
         return redirect(url_for('main.index'))
 
-    persons = Person.query.all()
-    return render_template('edit.html', entry=entry, persons=persons)
+    persons = cached_persons()
+    return render_template('edit.html', entry=entry, persons=persons, form=form)
 
 @bp.route('/delete/<int:id>', methods=['POST'])
 def delete_health_data(id):
-    entry = HealthData.query.get_or_404(id)
+    entry = db.session.get(HealthData, id) or abort(404)
     db.session.delete(entry)
     db.session.commit()
+    invalidate_chart_cache()
     flash('Entry deleted successfully')
     return redirect(url_for('main.index'))
 
 @bp.route('/chart')
 def chart():
-    # Fetch all health data entries from the database, ordered by timestamp
-    entries = HealthData.query.order_by(HealthData.timestamp).all()
-    
-    # Format timestamps as strings that JavaScript can understand
-    formatted_timestamps = [entry.timestamp.strftime('%Y-%m-%d %H:%M:%S') for entry in entries]
-    systolic_values = [entry.systolic for entry in entries]
-    diastolic_values = [entry.diastolic for entry in entries]
-    
-    # Create data points for the chart
-    data_points = []
-    for i in range(len(entries)):
-        data_points.append({
-            'x': formatted_timestamps[i],
-            'systolic': systolic_values[i],
-            'diastolic': diastolic_values[i]
-        })
-    
-    print(f"Formatted Timestamps: {formatted_timestamps}")  # Debug information
-    print(f"Systolic Values: {systolic_values}")  # Debug information
-    print(f"Diastolic Values: {diastolic_values}")  # Debug information
-    
-    return render_template('chart.html', 
-                          timestamps=formatted_timestamps, 
-                          systolic_values=systolic_values, 
-                          diastolic_values=diastolic_values,
-                          data_points=data_points)
+    # The page is just a shell; the browser fetches the data from
+    # /api/chart-data, so Jinja no longer renders the arrays element by
+    # element
+    return render_template('chart.html')
+
+# Below this many rows the chart endpoint returns raw readings; above it,
+# SQL aggregates them into hour or day buckets before anything is serialized
+DOWNSAMPLE_THRESHOLD = 1000
+
+# Built payloads per resolution, stamped with (row count, latest timestamp);
+# the stamp catches inserts, deletes and out-of-process writes, but an edit
+# can change readings without touching either value, so the write routes
+# also call invalidate_chart_cache() explicitly
+_CHART_CACHE = {}
+
+def invalidate_chart_cache():
+    # Drop the built chart payloads after a health data mutation
+    _CHART_CACHE.clear()
+
+@bp.route('/api/chart-data')
+def chart_data():
+    res = 'hour' if request.args.get('res') == 'hour' else 'day'
+
+    # One lightweight stamp query decides both cache validity and whether
+    # the data needs downsampling
+    total, latest = db.session.execute(
+        db.select(db.func.count(HealthData.id),
+                  db.func.max(HealthData.timestamp))).one()
+    stamp = (total, latest)
+    cached = _CHART_CACHE.get(res)
+    if cached is not None and cached[0] == stamp:
+        return jsonify(cached[1])
+
+    if total >= DOWNSAMPLE_THRESHOLD:
+        # Downsample in the database: GROUP BY a strftime bucket collapses
+        # the table to at most 24 points per day, so bandwidth and Chart.js
+        # render time stay flat as the table grows
+        if res == 'hour':
+            bucket = db.func.strftime('%Y-%m-%d %H:00:00', HealthData.timestamp)
+        else:
+            bucket = db.func.strftime('%Y-%m-%d 00:00:00', HealthData.timestamp)
+        rows = db.session.execute(
+            db.select(bucket.label('bucket'),
+                      db.func.avg(HealthData.systolic),
+                      db.func.avg(HealthData.diastolic))
+            .group_by(bucket).order_by(bucket)).all()
+
+        # strftime already produced display-ready strings, no per-row
+        # formatting needed
+        payload = {'timestamps': [row[0] for row in rows],
+                   'systolic': [row[1] for row in rows],
+                   'diastolic': [row[2] for row in rows]}
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            current_app.logger.debug("chart data points: %d (downsampled from %d)",
+                                     len(rows), total)
+    else:
+        # Small table: fetch only the three columns the chart needs as
+        # plain tuples and build the parallel arrays in a single pass
+        rows = db.session.execute(
+            db.select(HealthData.timestamp, HealthData.systolic, HealthData.diastolic)
+            .order_by(HealthData.timestamp)).all()
+
+        formatted_timestamps = []
+        systolic_values = []
+        diastolic_values = []
+        for timestamp, systolic, diastolic in rows:
+            # Format timestamps as strings that JavaScript can understand;
+            # isoformat produces the same 'YYYY-MM-DD HH:MM:SS' string as
+            # the old strftime call without parsing a format string per row
+            formatted_timestamps.append(timestamp.isoformat(sep=' ', timespec='seconds'))
+            systolic_values.append(systolic)
+            diastolic_values.append(diastolic)
+        payload = {'timestamps': formatted_timestamps,
+                   'systolic': systolic_values,
+                   'diastolic': diastolic_values}
+
+        # Log only the row count, and only when debug logging is on;
+        # printing the full lists blocked on stdout for every request
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            current_app.logger.debug("chart data points: %d", len(rows))
+
+    _CHART_CACHE[res] = (stamp, payload)
+    return jsonify(payload)
+
+@bp.route('/import', methods=['GET', 'POST'])
+def import_data():
+    if request.method == 'POST':
+        file = request.files.get('file')
+        person_id = request.form.get('person_id')
+
+        if not file or not file.filename:
+            flash('Please select a file to import')
+            return redirect(url_for('main.import_data'))
+
+        extension = os.path.splitext(file.filename)[1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            flash('Unsupported file type. Please upload a CSV, Excel or text file.')
+            return redirect(url_for('main.import_data'))
+
+        # Keep the upload in memory and hand it to the background pool;
+        # this skips the save-to-disk plus re-read round trip, and the
+        # request's stream is closed with the request anyway. The browser
+        # goes to a polling status page immediately
+        data = file.read()
+
+        # Hashing the payload is orders of magnitude cheaper than parsing
+        # it again, so identical re-uploads just show the earlier result -
+        # but only while the prior job is still running or actually
+        # imported rows; a failed or fruitless run is retried for real
+        digest = (hashlib.sha256(data).hexdigest(), person_id)
+        previous = IMPORT_DIGESTS.get(digest)
+        prior_job = IMPORT_JOBS.get(previous)
+        if prior_job is not None and (
+                prior_job['status'] == 'running'
+                or (prior_job['status'] == 'done'
+                    and prior_job['results']['success'])):
+            flash('This file was already imported; showing the previous result')
+            return redirect(url_for('main.import_status', job_id=previous))
+
+        prune_import_jobs()
+        job_id = uuid.uuid4().hex
+        IMPORT_JOBS[job_id] = {'status': 'running'}
+        IMPORT_DIGESTS[digest] = job_id
+        import_pool.submit(run_import, current_app._get_current_object(),
+                           job_id, io.BytesIO(data), extension, person_id)
+        return redirect(url_for('main.import_status', job_id=job_id))
+
+    persons = cached_persons()
+    return render_template('import.html', persons=persons)
+
+@bp.route('/import/status/<job_id>')
+def import_status(job_id):
+    job = IMPORT_JOBS.get(job_id) or abort(404)
+    return render_template('import_status.html', job=job, job_id=job_id)
+
+# Rendered schema text, cached after the first request; the schema is
+# static for a given deployment so there is no reason to re-query it
+_SCHEMA_CACHE = None
+
+@bp.route('/schema')
+def show_schema():
+    global _SCHEMA_CACHE
+    if _SCHEMA_CACHE is None:
+        # Go through the configured engine instead of opening a separate
+        # sqlite3 connection against a hardcoded file path
+        rows = db.session.execute(
+            db.text("SELECT sql FROM sqlite_master WHERE type='table'"))
+        _SCHEMA_CACHE = '\n\n'.join(row[0] for row in rows if row[0])
+    return f'<pre>{_SCHEMA_CACHE}</pre>'
 
 @bp.route('/register', methods=['GET', 'POST'])
 def register_person():
@@ -212,6 +307,7 @@ def register_person():
         )
         db.session.add(new_person)
         db.session.commit()
+        invalidate_persons()
         flash('Person registered successfully')
         return redirect(url_for('main.index'))
 
@@ -219,10 +315,10 @@ def register_person():
 
 @bp.route('/persons')
 def list_persons():
-    persons = Person.query.all()
+    persons = cached_persons()
     return render_template('persons.html', persons=persons)
 
 @bp.route('/person/<int:id>')
 def view_person(id):
-    person = Person.query.get_or_404(id)
+    person = db.session.get(Person, id) or abort(404)
     return render_template('person.html', person=person)
@@ -15,6 +15,25 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///instance/health_tracker.sqlite'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Batch multi-row INSERTs (data imports) into pages of 1000 parameter
+    # sets, keep compiled statements cached across requests, and validate
+    # pooled connections before reuse
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'insertmanyvalues_page_size': 1000,
+        'query_cache_size': 1200,
+        'pool_pre_ping': True,
+    }
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        # psycopg2 fast execution helpers: serialize executemany as
+        # multi-values INSERT instead of one round-trip per row
+        SQLALCHEMY_ENGINE_OPTIONS['executemany_mode'] = 'values_plus_batch'
+        # Pool sized for multi-worker gunicorn: 10 steady connections with
+        # up to 20 overflow under bursts, recycled before typical server
+        # idle timeouts can kill them
+        SQLALCHEMY_ENGINE_OPTIONS['pool_size'] = 10
+        SQLALCHEMY_ENGINE_OPTIONS['max_overflow'] = 20
+        SQLALCHEMY_ENGINE_OPTIONS['pool_recycle'] = 1800
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
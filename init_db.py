@@ -1,12 +1,23 @@
 import os
 import sqlite3
-from app import app, db
+from flask import Flask
+from app.models import db, Person
 
-# Ensure the instance directory exists
-os.makedirs('instance', exist_ok=True)
+# Build a minimal app instead of the full factory; creating tables only
+# needs the models and config, not the blueprints (whose import would drag
+# in the form/auth machinery for nothing on this CLI path)
+app = Flask(__name__)
+app.config.from_object('config.Config')
+db.init_app(app)
+
+# Resolve where the database file actually lives (flask-sqlalchemy places
+# relative SQLite paths under the instance folder) and make sure the
+# directory exists
+with app.app_context():
+    db_path = db.engine.url.database
+os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
 # Remove the existing database file if it exists
-db_path = 'instance/health_tracker.sqlite'
 if os.path.exists(db_path):
     try:
         os.remove(db_path)
@@ -32,7 +43,6 @@ except Exception as e:
 
 # Add initial data for testing
 with app.app_context():
-    from app.models import Person, HealthData
     person1 = Person(name="John Doe", age=30, gender="Male", description="Test person 1")
     person2 = Person(name="Jane Smith", age=25, gender="Female", description="Test person 2")
     db.session.add(person1)
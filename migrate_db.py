@@ -1,200 +1,232 @@
 import os
 import sqlite3
-from app import app, db
 
-def migrate_blood_pressure_data():
+from config import get_config
+
+def resolve_db_path():
     """
-    This script migrates the database from the old schema (with blood_pressure as a string)
-    to the new schema (with separate systolic and diastolic integer fields).
-    It preserves all existing data.
+    Resolve the SQLite file from the configured database URI, so this
+    script operates on the same file init_db.py creates: flask-sqlalchemy
+    places relative SQLite paths under the app's instance folder rather
+    than the current working directory.
+    """
+    prefix = 'sqlite:///'
+    uri = get_config().SQLALCHEMY_DATABASE_URI
+    if not uri.startswith(prefix):
+        raise RuntimeError(f"migrate_db.py only supports SQLite databases, got {uri}")
+    path = uri[len(prefix):]
+    if not os.path.isabs(path):
+        instance_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+        path = os.path.join(instance_dir, path)
+    return path
+
+def backup_database(db_path):
+    """
+    Back up the database with SQLite's Online Backup API, which is safe
+    against concurrent writers and skips free pages, unlike a raw file
+    copy that can tear an in-flight WAL.
     """
-    db_path = 'instance/health_tracker.sqlite'
-    
-    # Check if database exists
-    if not os.path.exists(db_path):
-        print(f"Database file not found at {db_path}")
-        return
-    
-    # Backup the database first
+    backup_path = f"{db_path}.backup"
     try:
-        from shutil import copyfile
-        backup_path = f"{db_path}.backup"
-        copyfile(db_path, backup_path)
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(backup_path)
+        src.backup(dst)
+        dst.close()
+        src.close()
         print(f"Database backup created at {backup_path}")
+        return True
     except Exception as e:
         print(f"Warning: Could not create backup: {e}")
-        return
-    
+        return False
+
+def tune_connection(conn):
+    """
+    Apply the write-heavy pragma profile to a migration connection:
+    WAL with relaxed sync removes the per-commit fsync, and sorts and
+    hot pages stay in memory. No locking_mode=EXCLUSIVE - it would fail
+    as soon as any other connection so much as has the WAL open, and
+    BEGIN IMMEDIATE already holds the write lock for the whole run.
+    """
+    for pragma in ("journal_mode=WAL", "synchronous=NORMAL",
+                   "temp_store=MEMORY", "cache_size=-65536"):
+        conn.execute(f"PRAGMA {pragma}")
+
+def checkpoint_wal(conn):
+    """
+    Flush WAL frames back into the main database file and truncate the
+    log, so a migration doesn't leave behind a WAL as large as the data
+    it touched.
+    """
     try:
-        # Connect to database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Check if the old schema is still in place
+        busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            print("Warning: WAL checkpoint incomplete; database busy")
+    except Exception as e:
+        print(f"Warning: Could not checkpoint WAL: {e}")
+
+def migrate_blood_pressure_data(conn):
+    """
+    Migrate the database from the old schema (with blood_pressure as a string)
+    to the new schema (with separate systolic and diastolic integer fields).
+    It preserves all existing data. Runs on the shared migration connection;
+    the caller owns the transaction.
+    """
+    cursor = conn.cursor()
+
+    # Check if the old schema is still in place
+    cursor.execute("PRAGMA table_info(health_data)")
+    columns = cursor.fetchall()
+    columns_dict = {col[1]: col for col in columns}
+
+    if 'blood_pressure' in columns_dict and 'systolic' not in columns_dict:
+        print("Migrating from old schema to new schema...")
+
+        # Split the "120/80" strings inside SQLite instead of rebuilding
+        # the table through Python: ALTERs add the columns and one UPDATE
+        # parses every row in a single scan, with CASE fallbacks to the
+        # old default values for unparseable data. heart_rate gets a new
+        # column too, because writing CAST results back into the legacy
+        # TEXT column would keep TEXT affinity and store strings
+        cursor.execute("ALTER TABLE health_data ADD COLUMN systolic INTEGER")
+        cursor.execute("ALTER TABLE health_data ADD COLUMN diastolic INTEGER")
+        cursor.execute("ALTER TABLE health_data ADD COLUMN heart_rate_int INTEGER")
+        # A value counts as numeric only when it is non-empty and contains
+        # digits exclusively; GLOB '[0-9]*' alone would let '12a' CAST to 12
+        cursor.execute("""
+        UPDATE health_data SET
+            systolic = CASE WHEN instr(blood_pressure, '/') > 1
+                    AND trim(substr(blood_pressure, 1, instr(blood_pressure, '/') - 1)) != ''
+                    AND trim(substr(blood_pressure, 1, instr(blood_pressure, '/') - 1)) NOT GLOB '*[^0-9]*'
+                THEN CAST(trim(substr(blood_pressure, 1, instr(blood_pressure, '/') - 1)) AS INTEGER)
+                ELSE 120 END,
+            diastolic = CASE WHEN instr(blood_pressure, '/') > 1
+                    AND trim(substr(blood_pressure, instr(blood_pressure, '/') + 1)) != ''
+                    AND trim(substr(blood_pressure, instr(blood_pressure, '/') + 1)) NOT GLOB '*[^0-9]*'
+                THEN CAST(trim(substr(blood_pressure, instr(blood_pressure, '/') + 1)) AS INTEGER)
+                ELSE 80 END,
+            heart_rate_int = CASE WHEN trim(heart_rate) != ''
+                    AND trim(heart_rate) NOT GLOB '*[^0-9]*'
+                THEN CAST(heart_rate AS INTEGER)
+                ELSE 70 END
+        """)
+        print(f"Converted {cursor.rowcount} rows.")
+
+        # Drop the old columns and move heart_rate_int into place (needs
+        # SQLite >= 3.35); on an older library the stale columns are left
+        # behind, which is harmless but keeps heart_rate as TEXT
+        try:
+            cursor.execute("ALTER TABLE health_data DROP COLUMN blood_pressure")
+            cursor.execute("ALTER TABLE health_data DROP COLUMN heart_rate")
+            cursor.execute("ALTER TABLE health_data RENAME COLUMN heart_rate_int TO heart_rate")
+        except sqlite3.OperationalError as e:
+            print(f"Warning: Could not drop legacy columns: {e}")
+
+        print("Migration completed successfully!")
+
+    elif 'systolic' in columns_dict and 'diastolic' in columns_dict:
+        print("Database already has the new schema. No migration needed.")
+    else:
+        raise RuntimeError("Unexpected database schema. Migration aborted.")
+
+def migrate_person_data(conn):
+    """
+    Migrate the database to include the new Person model.
+    It preserves all existing data. Runs on the shared migration connection;
+    the caller owns the transaction.
+    """
+    cursor = conn.cursor()
+
+    # Check if the Person table already exists
+    cursor.execute("PRAGMA table_info(person)")
+    columns = cursor.fetchall()
+
+    if not columns:
+        print("Creating Person table...")
+
+        # Create the Person table
+        cursor.execute("""
+        CREATE TABLE person (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            description TEXT
+        )
+        """)
+
+        # Add a foreign key reference to the Person model in the HealthData model
         cursor.execute("PRAGMA table_info(health_data)")
         columns = cursor.fetchall()
         columns_dict = {col[1]: col for col in columns}
-        
-        if 'blood_pressure' in columns_dict and 'systolic' not in columns_dict:
-            print("Migrating from old schema to new schema...")
-            
-            # Get all existing data
-            cursor.execute("SELECT id, blood_pressure, heart_rate, tags, timestamp FROM health_data")
-            rows = cursor.fetchall()
-            
-            # Create a temporary table with the new schema
-            cursor.execute("""
-            CREATE TABLE health_data_new (
-                id INTEGER PRIMARY KEY,
-                systolic INTEGER NOT NULL,
-                diastolic INTEGER NOT NULL,
-                heart_rate INTEGER NOT NULL,
-                tags TEXT,
-                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
-            # Migrate data to the new table
-            for row in rows:
-                id, blood_pressure, heart_rate, tags, timestamp = row
-                
-                # Parse blood pressure string (e.g., "120/80")
-                try:
-                    systolic, diastolic = blood_pressure.split('/')
-                    systolic = int(systolic.strip())
-                    diastolic = int(diastolic.strip())
-                except (ValueError, AttributeError):
-                    # If parsing fails, use default values and log the issue
-                    print(f"Warning: Could not parse blood pressure value '{blood_pressure}' for ID {id}. Using default values.")
-                    systolic = 120
-                    diastolic = 80
-                
-                # Convert heart_rate to integer if it's stored as string
-                try:
-                    heart_rate = int(heart_rate)
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not convert heart rate '{heart_rate}' to integer for ID {id}. Using default value.")
-                    heart_rate = 70
-                
-                # Insert into new table
-                cursor.execute(
-                    "INSERT INTO health_data_new (id, systolic, diastolic, heart_rate, tags, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-                    (id, systolic, diastolic, heart_rate, tags, timestamp)
-                )
-            
-            # Replace the old table with the new one
-            cursor.execute("DROP TABLE health_data")
-            cursor.execute("ALTER TABLE health_data_new RENAME TO health_data")
-            conn.commit()
-            print("Migration completed successfully!")
-        
-        elif 'systolic' in columns_dict and 'diastolic' in columns_dict:
-            print("Database already has the new schema. No migration needed.")
-        else:
-            print("Unexpected database schema. Migration aborted.")
-            
-    except Exception as e:
-        conn.rollback()
-        print(f"Error during migration: {e}")
-        print("The database was not modified. Your data is safe.")
-    finally:
-        conn.close()
 
-def migrate_person_data():
+        if 'person_id' not in columns_dict:
+            # Add the column in place instead of rebuilding the table:
+            # ALTER ADD COLUMN only touches the schema page, and one
+            # UPDATE backfills existing rows with the default person,
+            # so unchanged pages are never rewritten
+            cursor.execute("ALTER TABLE health_data ADD COLUMN person_id INTEGER REFERENCES person (id)")
+            cursor.execute("UPDATE health_data SET person_id = 1 WHERE person_id IS NULL")
+            print("Person table created and data migrated successfully!")
+
+    else:
+        print("Person table already exists. No migration needed.")
+
+def migrate_add_indexes(conn):
     """
-    This script migrates the database to include the new Person model.
-    It preserves all existing data.
+    Add the timestamp indexes used by the index and chart pages to an
+    existing database. It is safe to run more than once.
     """
-    db_path = 'instance/health_tracker.sqlite'
-    
-    # Check if database exists
-    if not os.path.exists(db_path):
-        print(f"Database file not found at {db_path}")
-        return
-    
-    # Backup the database first
-    try:
-        from shutil import copyfile
-        backup_path = f"{db_path}.backup"
-        copyfile(db_path, backup_path)
-        print(f"Database backup created at {backup_path}")
-    except Exception as e:
-        print(f"Warning: Could not create backup: {e}")
-        return
-    
-    try:
-        # Connect to database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Check if the Person table already exists
-        cursor.execute("PRAGMA table_info(person)")
-        columns = cursor.fetchall()
-        
-        if not columns:
-            print("Creating Person table...")
-            
-            # Create the Person table
-            cursor.execute("""
-            CREATE TABLE person (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                gender TEXT NOT NULL,
-                description TEXT
-            )
-            """)
-            
-            # Add a foreign key reference to the Person model in the HealthData model
-            cursor.execute("PRAGMA table_info(health_data)")
-            columns = cursor.fetchall()
-            columns_dict = {col[1]: col for col in columns}
-            
-            if 'person_id' not in columns_dict:
-                cursor.execute("""
-                CREATE TABLE health_data_new (
-                    id INTEGER PRIMARY KEY,
-                    person_id INTEGER NOT NULL,
-                    systolic INTEGER NOT NULL,
-                    diastolic INTEGER NOT NULL,
-                    heart_rate INTEGER NOT NULL,
-                    tags TEXT,
-                    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (person_id) REFERENCES person (id)
-                )
-                """)
-                
-                # Migrate data to the new table
-                cursor.execute("SELECT id, systolic, diastolic, heart_rate, tags, timestamp FROM health_data")
-                rows = cursor.fetchall()
-                
-                for row in rows:
-                    id, systolic, diastolic, heart_rate, tags, timestamp = row
-                    person_id = 1  # Default person_id for existing data
-                    
-                    cursor.execute(
-                        "INSERT INTO health_data_new (id, person_id, systolic, diastolic, heart_rate, tags, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                        (id, person_id, systolic, diastolic, heart_rate, tags, timestamp)
-                    )
-                
-                # Replace the old table with the new one
-                cursor.execute("DROP TABLE health_data")
-                cursor.execute("ALTER TABLE health_data_new RENAME TO health_data")
-                conn.commit()
-                print("Person table created and data migrated successfully!")
-        
-        else:
-            print("Person table already exists. No migration needed.")
-            
-    except Exception as e:
-        conn.rollback()
-        print(f"Error during migration: {e}")
-        print("The database was not modified. Your data is safe.")
-    finally:
-        conn.close()
+    cursor = conn.cursor()
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_health_data_timestamp ON health_data (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_health_data_person_ts ON health_data (person_id, timestamp)")
+    print("Timestamp indexes created successfully!")
 
 if __name__ == "__main__":
-    # Run the migrations
-    migrate_blood_pressure_data()
-    migrate_person_data()
-    print("Database migration script completed.")
+    db_path = resolve_db_path()
+
+    # Open with mode=rw so the connect itself fails when the file is
+    # missing, instead of an os.path.exists check that races with the
+    # filesystem and would let sqlite3 silently create an empty database
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True)
+    except sqlite3.OperationalError as e:
+        print(f"Could not open database at {db_path}: {e}")
+    else:
+        if not backup_database(db_path):
+            print("Migration aborted: could not back up the database.")
+            conn.close()
+        else:
+            # One shared connection for all migrations: the pragmas are
+            # applied once and the page cache stays warm between steps.
+            # isolation_level of None hands transaction control to us, so
+            # BEGIN IMMEDIATE wraps the whole run in a single write
+            # transaction - one fsync at the end, and a failure in any
+            # step rolls everything back together
+            conn.isolation_level = None
+            try:
+                # Switching journal modes and taking the write lock can
+                # both fail if another connection (e.g. the running app)
+                # holds the database; abort with the friendly message
+                # instead of a traceback
+                try:
+                    tune_connection(conn)
+                    conn.execute("BEGIN IMMEDIATE")
+                except sqlite3.OperationalError as e:
+                    print(f"Could not lock the database: {e}")
+                    print("Stop the app before running migrations. "
+                          "The database was not modified. Your data is safe.")
+                else:
+                    try:
+                        migrate_blood_pressure_data(conn)
+                        migrate_person_data(conn)
+                        migrate_add_indexes(conn)
+                        conn.execute("COMMIT")
+                        print("Database migration script completed.")
+                    except Exception as e:
+                        conn.execute("ROLLBACK")
+                        print(f"Error during migration: {e}")
+                        print("The database was not modified. Your data is safe.")
+            finally:
+                checkpoint_wal(conn)
+                conn.close()